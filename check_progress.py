@@ -7,14 +7,88 @@ import sys
 from pathlib import Path
 from datetime import datetime
 
+# ijson позволяет читать метаданные потоково, не загружая весь файл в память.
+# Если библиотека не установлена, используем обычный json.load.
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# orjson ускоряет парсинг строк журнала; без него работает стандартный json
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
 
 def format_size(size_bytes: int) -> str:
-    """Форматирование размера файла в читаемый вид."""
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if size_bytes < 1024.0:
-            return f"{size_bytes:.2f} {unit}"
-        size_bytes /= 1024.0
-    return f"{size_bytes:.2f} PB"
+    """Форматирование размера файла в читаемый вид (O(1), без цикла делений)."""
+    if size_bytes <= 0:
+        return "0.00 B"
+    # Порядок величины по битовой длине: 10 бит на каждую ступень в 1024 раза
+    index = min((int(size_bytes).bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (index * 10)):.2f} {_SIZE_UNITS[index]}"
+
+
+def iter_channels(metadata_file: Path):
+    """
+    Потоковое чтение метаданных старого формата по одному каналу за раз.
+
+    С ijson файл парсится инкрементально, и в памяти находится только
+    текущий канал, а не весь документ целиком. Без ijson - обычный json.load.
+    """
+    if ijson is not None:
+        with open(metadata_file, 'rb') as f:
+            # kvitems(f, '') выдает пары (имя_канала, данные_канала) верхнего уровня
+            yield from ijson.kvitems(f, '')
+    else:
+        with open(metadata_file, 'r', encoding='utf-8') as f:
+            yield from json.load(f).items()
+
+
+def iter_channels_ndjson(metadata_file: Path):
+    """
+    Агрегация прогресса из NDJSON-журнала за один последовательный проход.
+
+    Каждая строка журнала - одна запись о файле; строки читаются по одной,
+    поэтому память ограничена итоговой сводкой, а не размером файла.
+    """
+    channels = {}
+    with open(metadata_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                event = _loads(line)
+            except Exception:
+                continue
+            channel = event.get('channel')
+            if channel is None:
+                continue
+            ch = channels.setdefault(channel, {'messages': {}, 'last_updated': None})
+            # Последняя запись по message_id определяет итоговый статус
+            ch['messages'][event.get('message_id')] = (
+                event.get('status'),
+                event.get('file_size', 0)
+            )
+            ch['last_updated'] = event.get('ts')
+
+    for channel_name, ch in channels.items():
+        messages = ch['messages']
+        yield channel_name, {
+            'total_files': len(messages),
+            'total_size': sum(
+                size for status, size in messages.values()
+                if status == 'completed'
+            ),
+            'last_updated': ch['last_updated'] or 'N/A',
+            'messages': messages
+        }
 
 
 def check_progress():
@@ -22,59 +96,66 @@ def check_progress():
     # Определяем путь к метаданным
     current_file = Path(__file__).resolve()
     project_root = current_file.parent
-    metadata_file = project_root / "data" / "downloaded_files.json"
-    
-    if not metadata_file.exists():
+    data_path = project_root / "data"
+    # Новый формат - NDJSON-журнал; старый - единый JSON-документ
+    ndjson_file = data_path / "downloaded_files.ndjson"
+    legacy_file = data_path / "downloaded_files.json"
+
+    if ndjson_file.exists():
+        channels_iter = iter_channels_ndjson(ndjson_file)
+    elif legacy_file.exists():
+        channels_iter = iter_channels(legacy_file)
+    else:
         print("❌ Метаданные не найдены.")
-        print(f"   Файл: {metadata_file}")
+        print(f"   Файл: {ndjson_file}")
         print("   Загрузка еще не началась или файл не был создан.")
         return
-    
+
+    total_channels = 0
+    total_files_all = 0
+    total_size_all = 0
+
     try:
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
+        for channel_name, channel_data in channels_iter:
+            # Печатаем шапку только когда нашелся хотя бы один канал
+            if total_channels == 0:
+                print("=" * 70)
+                print("📊 ТЕКУЩИЙ ПРОГРЕСС ЗАГРУЗКИ")
+                print("=" * 70)
+            total_channels += 1
+
+            total_files = channel_data.get('total_files', 0)
+            total_size = channel_data.get('total_size', 0)
+            last_updated = channel_data.get('last_updated', 'N/A')
+
+            # Форматируем дату
+            try:
+                if last_updated != 'N/A':
+                    dt = datetime.fromisoformat(last_updated)
+                    last_updated = dt.strftime("%Y-%m-%d %H:%M:%S")
+            except:
+                pass
+
+            total_files_all += total_files
+            total_size_all += total_size
+
+            print(f"\n📺 Канал: {channel_name}")
+            print(f"   ✅ Скачано файлов: {total_files}")
+            print(f"   💾 Общий размер: {format_size(total_size)}")
+            print(f"   🕐 Последнее обновление: {last_updated}")
+
+            # Показываем информацию о последних файлах
+            messages = channel_data.get('messages', {})
+            if messages:
+                print(f"   📝 Всего записей в метаданных: {len(messages)}")
     except Exception as e:
         print(f"❌ Ошибка при чтении метаданных: {e}")
         return
-    
-    if not metadata:
+
+    if total_channels == 0:
         print("📭 Метаданные пусты. Файлы еще не скачаны.")
         return
-    
-    print("=" * 70)
-    print("📊 ТЕКУЩИЙ ПРОГРЕСС ЗАГРУЗКИ")
-    print("=" * 70)
-    
-    total_channels = len(metadata)
-    total_files_all = 0
-    total_size_all = 0
-    
-    for channel_name, channel_data in metadata.items():
-        total_files = channel_data.get('total_files', 0)
-        total_size = channel_data.get('total_size', 0)
-        last_updated = channel_data.get('last_updated', 'N/A')
-        
-        # Форматируем дату
-        try:
-            if last_updated != 'N/A':
-                dt = datetime.fromisoformat(last_updated)
-                last_updated = dt.strftime("%Y-%m-%d %H:%M:%S")
-        except:
-            pass
-        
-        total_files_all += total_files
-        total_size_all += total_size
-        
-        print(f"\n📺 Канал: {channel_name}")
-        print(f"   ✅ Скачано файлов: {total_files}")
-        print(f"   💾 Общий размер: {format_size(total_size)}")
-        print(f"   🕐 Последнее обновление: {last_updated}")
-        
-        # Показываем информацию о последних файлах
-        messages = channel_data.get('messages', {})
-        if messages:
-            print(f"   📝 Всего записей в метаданных: {len(messages)}")
-    
+
     print("\n" + "=" * 70)
     print("📈 ОБЩАЯ СТАТИСТИКА")
     print("=" * 70)
@@ -2,10 +2,12 @@
 Менеджер загрузок с поддержкой параллельных загрузок и очереди.
 """
 import asyncio
+import contextlib
 import logging
-import time
+import os
 import re
-from typing import List, Optional, Callable, Dict
+import weakref
+from typing import List, Optional, Callable, Dict, Tuple
 from pathlib import Path
 from tqdm.asyncio import tqdm
 from tqdm import tqdm as sync_tqdm
@@ -17,6 +19,10 @@ from .video_quality import VideoQualityHandler
 
 logger = logging.getLogger(__name__)
 
+# Таблица замены недопустимых для файловой системы символов:
+# один проход str.translate вместо восьми вызовов str.replace
+_SANITIZE_TABLE = str.maketrans({char: '_' for char in '<>:"/\\|?*'})
+
 
 class DownloadManager:
     """Менеджер для управления загрузкой файлов."""
@@ -53,22 +59,69 @@ class DownloadManager:
         self.failed_count = 0
         self.total_size = 0
         
-        # Словарь для хранения прогресс-баров активных загрузок
-        self.active_progress_bars: Dict[int, sync_tqdm] = {}
+        # Реестр прогресс-баров активных загрузок. Слабые ссылки:
+        # закрытый и отпущенный контекстным менеджером бар исчезает
+        # из реестра сам, без ручного del
+        self.active_progress_bars = weakref.WeakValueDictionary()
+
+        # Кэш содержимого папок серий: один os.scandir на папку вместо
+        # отдельных stat() для description.txt / poster.jpg / видеофайлов
+        self._series_inventory: Dict[Path, set] = {}
 
-    def _create_progress_callback(self, message_id: int, file_name: str, total_size: int) -> Callable:
+    def _get_series_inventory(self, series_folder: Path) -> set:
         """
-        Создание callback для отслеживания прогресса загрузки.
+        Получение множества имен файлов в папке серии (с кэшированием).
+
+        Args:
+            series_folder: Папка серии
+
+        Returns:
+            Множество имен файлов в папке
+        """
+        inventory = self._series_inventory.get(series_folder)
+        if inventory is None:
+            try:
+                with os.scandir(series_folder) as entries:
+                    inventory = {entry.name for entry in entries}
+            except OSError:
+                inventory = set()
+            self._series_inventory[series_folder] = inventory
+        return inventory
+
+    @staticmethod
+    def _file_size(path: Path) -> int:
+        """
+        Размер файла в байтах или 0, если файл отсутствует.
+
+        Один вызов os.stat вместо пары exists() + stat().
+
+        Args:
+            path: Путь к файлу
+
+        Returns:
+            Размер файла в байтах (0 если файла нет)
+        """
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return 0
+
+    @contextlib.contextmanager
+    def _progress_bar(self, message_id: int, file_name: str, total_size: int):
+        """
+        Контекстный менеджер прогресс-бара одной загрузки.
+
+        Создает бар, регистрирует его в реестре активных загрузок и
+        гарантированно закрывает при выходе - в том числе при ошибке
+        или отмене задачи.
 
         Args:
             message_id: ID сообщения
             file_name: Имя файла
             total_size: Общий размер файла в байтах
-
-        Returns:
-            Callback функция для telethon
         """
-        # Создаем прогресс-бар для этого файла
+        # Скорость загрузки tqdm считает и выводит сам (unit_scale),
+        # отдельный подсчет в callback не нужен.
         pbar = sync_tqdm(
             total=total_size,
             unit='B',
@@ -76,37 +129,36 @@ class DownloadManager:
             unit_divisor=1024,
             desc=file_name[:50],  # Ограничиваем длину имени
             leave=False,  # Не оставляем прогресс-бар после завершения
-            ncols=100
+            ncols=100,
+            dynamic_ncols=False,
+            mininterval=0.5,  # tqdm сам ограничивает частоту перерисовки
+            maxinterval=2.0,
+            smoothing=0.05
         )
-        
         self.active_progress_bars[message_id] = pbar
-        last_update_time = time.time()
-        last_downloaded = 0
+        try:
+            yield pbar
+        finally:
+            pbar.close()
 
+    @staticmethod
+    def _make_progress_callback(pbar: sync_tqdm) -> Callable:
+        """
+        Создание callback для отслеживания прогресса загрузки.
+
+        Args:
+            pbar: Прогресс-бар загрузки
+
+        Returns:
+            Callback функция для telethon
+        """
         def callback(current: int, total: int):
-            """Callback для обновления прогресса."""
-            nonlocal last_update_time, last_downloaded
-            
-            # Обновляем прогресс-бар
+            """Callback для обновления прогресса (вызывается на каждый чанк telethon)."""
+            # update() дешев: перерисовку tqdm выполняет не чаще mininterval,
+            # принудительный refresh() на каждый чанк не нужен
             if pbar.total != total:
                 pbar.total = total
-            pbar.n = current
-            pbar.refresh()
-            
-            # Вычисляем скорость загрузки
-            current_time = time.time()
-            time_diff = current_time - last_update_time
-            
-            if time_diff >= 1.0:  # Обновляем скорость раз в секунду
-                downloaded_diff = current - last_downloaded
-                speed = downloaded_diff / time_diff if time_diff > 0 else 0
-                
-                # Обновляем описание с информацией о скорости
-                speed_str = self.file_handler.format_file_size(speed) + "/s"
-                pbar.set_postfix_str(speed_str)
-                
-                last_update_time = current_time
-                last_downloaded = current
+            pbar.update(current - pbar.n)
 
         return callback
 
@@ -122,11 +174,8 @@ class DownloadManager:
             True если описание сохранено
         """
         try:
-            description_text = ""
-            
-            # Получаем текст сообщения
-            if hasattr(message, 'message') and message.message:
-                description_text = message.message.strip()
+            # Получаем текст сообщения (getattr вместо пары hasattr + доступ)
+            description_text = (getattr(message, 'message', None) or '').strip()
             
             # Если есть описание, сохраняем его
             if description_text:
@@ -155,37 +204,37 @@ class DownloadManager:
             True если постер скачан
         """
         try:
-            # Проверяем, есть ли фото в сообщении
-            if message.media and isinstance(message.media, MessageMediaPhoto):
+            media = message.media
+
+            # Вариант 1: постер - это фото в самом сообщении
+            if media and isinstance(media, MessageMediaPhoto):
                 poster_file = series_folder / "poster.jpg"
-                await client.download_media(message.media, file=str(poster_file))
-                if poster_file.exists() and poster_file.stat().st_size > 0:
+                await client.download_media(media, file=str(poster_file))
+                if self._file_size(poster_file) > 0:
                     logger.debug(f"Скачан постер: {poster_file}")
                     return True
-            
-            # Проверяем, есть ли thumbnail в документе
-            if message.media and hasattr(message.media, 'document'):
-                doc = message.media.document
-                if doc and hasattr(doc, 'thumbs') and doc.thumbs and len(doc.thumbs) > 0:
-                    # Пробуем скачать thumbnail
-                    poster_file = series_folder / "poster.jpg"
-                    try:
-                        # Скачиваем thumbnail используя thumb параметр
-                        await client.download_media(message, thumb=doc.thumbs[0], file=str(poster_file))
-                        if poster_file.exists() and poster_file.stat().st_size > 0:
-                            logger.debug(f"Скачан постер из thumbnail: {poster_file}")
-                            return True
-                    except Exception as thumb_error:
-                        logger.debug(f"Не удалось скачать thumbnail: {thumb_error}")
-                        # Пробуем альтернативный способ - скачать как фото
-                        try:
-                            await client.download_media(message, file=str(poster_file), thumb=-1)
-                            if poster_file.exists() and poster_file.stat().st_size > 0:
-                                logger.debug(f"Скачан постер альтернативным способом: {poster_file}")
-                                return True
-                        except:
-                            pass
-            
+                return False
+
+            # Вариант 2: thumbnail документа. Если thumbs заведомо пуст,
+            # выходим сразу и не тратим RPC на запросы без результата
+            doc = getattr(media, 'document', None) if media else None
+            thumbs = getattr(doc, 'thumbs', None) if doc else None
+            if not thumbs:
+                logger.debug("Постер отсутствует")
+                return False
+
+            poster_file = series_folder / "poster.jpg"
+            try:
+                # Последний thumbnail в списке - обычно самый крупный
+                await client.download_media(message, thumb=thumbs[-1], file=str(poster_file))
+            except Exception as thumb_error:
+                logger.debug(f"Не удалось скачать thumbnail: {thumb_error}")
+                return False
+
+            if self._file_size(poster_file) > 0:
+                logger.debug(f"Скачан постер из thumbnail: {poster_file}")
+                return True
+
             logger.debug("Постер отсутствует")
             return False
         except Exception as e:
@@ -215,13 +264,13 @@ class DownloadManager:
                 photo_file = series_folder / f"image_{index}.jpg"
 
                 # Не перезаписываем уже существующие файлы
-                if photo_file.exists() and photo_file.stat().st_size > 0:
+                if self._file_size(photo_file) > 0:
                     index += 1
                     continue
 
                 await client.download_media(msg.media, file=str(photo_file))
 
-                if photo_file.exists() and photo_file.stat().st_size > 0:
+                if self._file_size(photo_file) > 0:
                     downloaded_count += 1
                     index += 1
                     logger.debug(f"Скачано дополнительное фото: {photo_file}")
@@ -236,7 +285,7 @@ class DownloadManager:
         message: Message,
         channel_name: str,
         progress_callback: Optional[Callable] = None
-    ) -> bool:
+    ) -> Optional[Tuple[str, int]]:
         """
         Загрузка одного видео с описанием и постером.
 
@@ -255,28 +304,29 @@ class DownloadManager:
             progress_callback: Callback для прогресса (если None, создается автоматически)
 
         Returns:
-            True если загрузка успешна
+            Кортеж (статус, размер_в_байтах), где статус - 'downloaded',
+            'skipped' или 'failed', либо None если сообщение не содержит видео.
+            Счетчики статистики обновляет download_batch по этим результатам.
         """
         message_id = message.id
         
         # Проверяем, не скачан ли уже файл
         if self.file_handler.is_file_downloaded(message_id, channel_name):
             logger.debug(f"Файл {message_id} уже скачан, пропускаем")
-            self.skipped_count += 1
-            return False
+            return 'skipped', 0
 
         # Проверяем качество видео
-        if not message.media or not isinstance(message.media, MessageMediaDocument):
+        media = message.media
+        if not media or not isinstance(media, MessageMediaDocument):
             logger.warning(f"Сообщение {message_id} не содержит видео")
-            return False
+            return None
 
-        document = message.media.document
+        document = media.document
         should_download, quality = self.quality_handler.should_download_video(document)
         
         if not should_download:
             logger.debug(f"Видео {message_id} не подходит по качеству, пропускаем")
-            self.skipped_count += 1
-            return False
+            return 'skipped', 0
 
         # Получаем название серии
         series_name = self._get_series_name(message)
@@ -284,15 +334,23 @@ class DownloadManager:
         # Создаем папку для серии
         series_folder = self.file_handler.get_series_folder(channel_name, series_name)
         
-        # Скачиваем описание (только один раз для серии)
-        description_file = series_folder / "description.txt"
-        if not description_file.exists():
-            await self._download_description(message, series_folder)
-        
-        # Скачиваем постер (только один раз для серии)
-        poster_file = series_folder / "poster.jpg"
-        if not poster_file.exists():
-            await self._download_poster(message, series_folder, self.client)
+        # Один раз сканируем папку серии вместо отдельных проверок exists()
+        inventory = self._get_series_inventory(series_folder)
+
+        # Скачиваем описание и постер (только один раз для серии).
+        # Это независимые операции - выполняем их параллельно
+        side_downloads = []
+        side_names = []
+        if "description.txt" not in inventory:
+            side_downloads.append(self._download_description(message, series_folder))
+            side_names.append("description.txt")
+        if "poster.jpg" not in inventory:
+            side_downloads.append(self._download_poster(message, series_folder, self.client))
+            side_names.append("poster.jpg")
+        if side_downloads:
+            for name, saved in zip(side_names, await asyncio.gather(*side_downloads)):
+                if saved:
+                    inventory.add(name)
 
         # Скачиваем все дополнительные фото из того же альбома/поста, если они есть
         album_photos = getattr(message, "_album_photos", None)
@@ -304,10 +362,11 @@ class DownloadManager:
         file_path = series_folder / file_name
 
         # Проверяем, не скачан ли уже файл этого качества
-        if file_path.exists():
+        # (по кэшированному содержимому папки, без лишнего stat())
+        if file_name in inventory and file_path.exists():
             # Проверяем размер файла - если он неполный, удаляем и начинаем заново
             file_size = file_path.stat().st_size
-            expected_size = document.size if hasattr(document, 'size') else 0
+            expected_size = getattr(document, 'size', 0)
             
             if expected_size > 0 and file_size < expected_size:
                 # Файл неполный - удаляем и начинаем заново
@@ -318,29 +377,27 @@ class DownloadManager:
                 # Пытаемся удалить файл с обработкой ошибок
                 try:
                     file_path.unlink()
+                    inventory.discard(file_name)
                 except PermissionError as e:
                     # Файл занят другим процессом - пропускаем этот файл
                     logger.warning(
                         f"Не удалось удалить файл {file_name}: файл занят другим процессом. "
                         f"Пропускаем загрузку."
                     )
-                    self.skipped_count += 1
-                    return False
+                    return 'skipped', 0
                 except OSError as e:
                     # Другие ошибки файловой системы
                     logger.warning(
                         f"Не удалось удалить файл {file_name}: {e}. Пропускаем загрузку."
                     )
-                    self.skipped_count += 1
-                    return False
+                    return 'skipped', 0
             else:
                 # Файл полный - пропускаем
                 logger.debug(f"Файл {file_name} уже существует и полный, пропускаем")
-                self.skipped_count += 1
-                return False
+                return 'skipped', 0
 
         # Получаем размер файла для прогресс-бара
-        total_size = document.size if hasattr(document, 'size') else 0
+        total_size = getattr(document, 'size', 0)
         
         # Сохраняем метаданные СРАЗУ после начала загрузки, чтобы можно было продолжить
         # при следующем запуске, даже если загрузка прервется
@@ -353,40 +410,38 @@ class DownloadManager:
         )
         logger.debug(f"Начата загрузка {file_name}, метаданные сохранены")
         
-        # Создаем callback для прогресса, если не передан
-        if progress_callback is None:
-            progress_callback = self._create_progress_callback(message_id, file_name, total_size)
-
-        # Пробуем загрузить с повторными попытками
-        for attempt in range(self.retry_attempts):
-            try:
-                # Проверяем подключение перед попыткой скачивания
-                if not self.client.is_connected():
-                    logger.warning(f"Клиент отключен, пропускаем загрузку {message_id}")
-                    # Закрываем прогресс-бар
-                    if message_id in self.active_progress_bars:
-                        self.active_progress_bars[message_id].close()
-                        del self.active_progress_bars[message_id]
-                    self.failed_count += 1
-                    return False
-                
-                # Загружаем файл
-                await self.client.download_media(
-                    message,
-                    file=str(file_path),
-                    progress_callback=progress_callback
+        # Создаем callback для прогресса, если не передан. ExitStack
+        # гарантирует закрытие нашего бара при любом выходе из попыток
+        # (успех, ошибка, отмена), без ручных close/del в каждой ветке
+        with contextlib.ExitStack() as cleanup:
+            if progress_callback is None:
+                pbar = cleanup.enter_context(
+                    self._progress_bar(message_id, file_name, total_size)
                 )
-                
-                # Закрываем прогресс-бар после успешной загрузки
-                if message_id in self.active_progress_bars:
-                    self.active_progress_bars[message_id].close()
-                    del self.active_progress_bars[message_id]
-
-                # Проверяем, что файл действительно скачан
-                if file_path.exists():
-                    file_size = file_path.stat().st_size
-                    self.total_size += file_size
-                    
+                progress_callback = self._make_progress_callback(pbar)
+
+            # Пробуем загрузить с повторными попытками
+            for attempt in range(self.retry_attempts):
+                try:
+                    # Проверяем подключение перед попыткой скачивания
+                    if not self.client.is_connected():
+                        logger.warning(f"Клиент отключен, пропускаем загрузку {message_id}")
+                        return 'failed', 0
+
+                    # Загружаем файл
+                    await self.client.download_media(
+                        message,
+                        file=str(file_path),
+                        progress_callback=progress_callback
+                    )
+
+                    # Проверяем, что файл действительно скачан
+                    # (один os.stat вместо пары exists() + stat())
+                    try:
+                        file_size = os.stat(file_path).st_size
+                    except FileNotFoundError:
+                        raise Exception("Файл не был создан после загрузки")
+
                     # Отмечаем как скачанный
                     self.file_handler.mark_file_as_downloaded(
                         message_id,
@@ -395,45 +450,33 @@ class DownloadManager:
                         file_size,
                         quality
                     )
-                    
-                    self.downloaded_count += 1
+
+                    inventory.add(file_name)
                     logger.info(f"✓ Скачано: {series_name}/{file_name} ({self.file_handler.format_file_size(file_size)})")
-                    return True
-                else:
-                    raise Exception("Файл не был создан после загрузки")
+                    return 'downloaded', file_size
 
-            except FloodWaitError as e:
-                logger.warning(f"FloodWait: нужно подождать {e.seconds} секунд")
-                await asyncio.sleep(e.seconds)
-                # Не считаем это как попытку, продолжаем
-                continue
+                except FloodWaitError as e:
+                    logger.warning(f"FloodWait: нужно подождать {e.seconds} секунд")
+                    await asyncio.sleep(e.seconds)
+                    # Не считаем это как попытку, продолжаем
+                    continue
 
-            except Exception as e:
-                # Проверяем, является ли это ошибкой отключения
-                error_str = str(e).lower()
-                if 'disconnected' in error_str or 'cannot send requests' in error_str:
-                    # Ошибка подключения - клиент отключен
-                    logger.warning(f"Клиент отключен при загрузке {message_id}: {e}")
-                    # Закрываем прогресс-бар
-                    if message_id in self.active_progress_bars:
-                        self.active_progress_bars[message_id].close()
-                        del self.active_progress_bars[message_id]
-                    self.failed_count += 1
-                    return False
-                # Закрываем прогресс-бар при ошибке
-                if message_id in self.active_progress_bars:
-                    self.active_progress_bars[message_id].close()
-                    del self.active_progress_bars[message_id]
-                
-                logger.warning(f"Попытка {attempt + 1}/{self.retry_attempts} не удалась для {message_id}: {e}")
-                if attempt < self.retry_attempts - 1:
-                    await asyncio.sleep(self.retry_delay)
-                else:
-                    logger.error(f"Не удалось скачать {message_id} после {self.retry_attempts} попыток")
-                    self.failed_count += 1
-                    return False
+                except Exception as e:
+                    # Проверяем, является ли это ошибкой отключения
+                    error_str = str(e).lower()
+                    if 'disconnected' in error_str or 'cannot send requests' in error_str:
+                        # Ошибка подключения - клиент отключен
+                        logger.warning(f"Клиент отключен при загрузке {message_id}: {e}")
+                        return 'failed', 0
 
-        return False
+                    logger.warning(f"Попытка {attempt + 1}/{self.retry_attempts} не удалась для {message_id}: {e}")
+                    if attempt < self.retry_attempts - 1:
+                        await asyncio.sleep(self.retry_delay)
+                    else:
+                        logger.error(f"Не удалось скачать {message_id} после {self.retry_attempts} попыток")
+                        return 'failed', 0
+
+        return None
 
     def _sanitize_filename(self, filename: str) -> str:
         """
@@ -446,17 +489,20 @@ class DownloadManager:
             Очищенное имя файла
         """
         # Заменяем недопустимые символы на подчеркивания
-        invalid_chars = '<>:"/\\|?*'
-        for char in invalid_chars:
-            filename = filename.replace(char, '_')
-        
+        filename = filename.translate(_SANITIZE_TABLE)
+
         # Удаляем лишние пробелы и точки
         filename = filename.strip('. ')
-        
-        # Ограничиваем длину (Windows ограничение - 255 символов, но оставляем запас)
-        if len(filename) > 200:
-            filename = filename[:200]
-        
+
+        # Ограничиваем длину в байтах UTF-8 (лимит файловых систем - 255 байт
+        # на компонент пути, оставляем запас). Обрезка по символам пропускала
+        # кириллические имена вдвое длиннее лимита, и загрузка падала уже
+        # на open() после скачивания
+        encoded = filename.encode('utf-8')
+        if len(encoded) > 200:
+            # decode с 'ignore' отбрасывает возможный разрезанный символ на границе
+            filename = encoded[:200].decode('utf-8', 'ignore').rstrip('. ')
+
         return filename
 
     def _extract_title_from_text(self, text: str) -> str:
@@ -465,8 +511,12 @@ class DownloadManager:
 
         Пример: из "Моя сестра - 1 серия 480p" получаем "Моя сестра".
         """
-        # Берем только первую строку — обычно там заголовок
-        text = text.split('\n', 1)[0]
+        # Берем только первую строку — обычно там заголовок.
+        # Ищем границу и срезаем, не аллоцируя "хвост" длинного поста,
+        # как это делает split('\n', 1)
+        newline_pos = text.find('\n')
+        if newline_pos != -1:
+            text = text[:newline_pos]
         text = text.replace('\r', ' ').strip()
 
         # Если есть конструкция "Название - 1 серия", "Название — 1 и 2 серии" и т.п.,
@@ -532,15 +582,16 @@ class DownloadManager:
 
         # Приоритет 1: пробуем взять название из текста поста
         # Сначала проверяем текст в самом сообщении с видео
-        if hasattr(message, 'message') and message.message:
-            raw_text = message.message.strip()
-            if raw_text:
-                title = self._extract_title_from_text(raw_text)
-                if title:
-                    series_name = title
-                    logger.debug(
-                        f"Использован текст сообщения для названия: {series_name[:50]}..."
-                    )
+        raw_text = getattr(message, 'message', None)
+        if raw_text and not raw_text.isspace():
+            # Не делаем strip() всего текста - первую строку обрежет
+            # _extract_title_from_text, а isspace() не аллоцирует копию
+            title = self._extract_title_from_text(raw_text)
+            if title:
+                series_name = title
+                logger.debug(
+                    f"Использован текст сообщения для названия: {series_name[:50]}..."
+                )
         
         # Если не нашли текст в сообщении с видео, проверяем все сообщения альбома
         # (в Telegram текст поста часто находится в первом сообщении альбома)
@@ -549,25 +600,25 @@ class DownloadManager:
             if album_messages:
                 # Проверяем все сообщения альбома, начиная с первого (там обычно текст)
                 for album_msg in album_messages:
-                    if hasattr(album_msg, 'message') and album_msg.message:
-                        raw_text = album_msg.message.strip()
-                        if raw_text:
-                            title = self._extract_title_from_text(raw_text)
-                            if title:
-                                series_name = title
-                                logger.debug(
-                                    f"Использован текст из альбома для названия: {series_name[:50]}..."
-                                )
-                                break
+                    raw_text = getattr(album_msg, 'message', None)
+                    if raw_text and not raw_text.isspace():
+                        title = self._extract_title_from_text(raw_text)
+                        if title:
+                            series_name = title
+                            logger.debug(
+                                f"Использован текст из альбома для названия: {series_name[:50]}..."
+                            )
+                            break
 
         # Приоритет 2: fallback к имени файла документа (только если это не просто "серия 1" и т.п.)
-        if not series_name and message.media and hasattr(message.media, 'document'):
-            doc = message.media.document
-            if doc and hasattr(doc, 'attributes'):
-                for attr in doc.attributes:
-                    if hasattr(attr, 'file_name') and attr.file_name:
+        if not series_name:
+            doc = getattr(message.media, 'document', None) if message.media else None
+            if doc is not None:
+                for attr in getattr(doc, 'attributes', ()):
+                    file_name_attr = getattr(attr, 'file_name', None)
+                    if file_name_attr:
                         # Убираем расширение
-                        name_parts = attr.file_name.rsplit('.', 1)
+                        name_parts = file_name_attr.rsplit('.', 1)
                         file_name_without_ext = name_parts[0]
                         
                         # Проверяем, что имя файла не является просто номером серии
@@ -621,13 +672,100 @@ class DownloadManager:
         
         return file_name
 
+    async def download_stream(
+        self,
+        messages,
+        channel_name: str,
+        total: Optional[int] = None
+    ) -> Dict:
+        """
+        Загрузка видео по мере их поступления из асинхронного итератора.
+
+        Перечисление канала и загрузка идут параллельно: первые файлы
+        качаются, пока остальные сообщения еще перечисляются. Очередь
+        ограничена, поэтому перечисление не убегает далеко вперед и
+        не держит в памяти все сообщения канала разом.
+
+        Args:
+            messages: Асинхронный итератор сообщений для загрузки
+            channel_name: Имя канала
+            total: Количество сообщений для прогресс-бара (None = неизвестно)
+
+        Returns:
+            Словарь со статистикой загрузки
+        """
+        # Создаем прогресс-бар
+        pbar = tqdm(total=total, desc=f"Загрузка из {channel_name}", unit="файл")
+
+        # Очередь с ограничением: перечисление притормаживает,
+        # когда загрузчики не успевают
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrent * 4)
+
+        async def worker():
+            """Загрузка сообщений из очереди до сентинела None."""
+            while True:
+                message = await queue.get()
+                if message is None:
+                    return
+                try:
+                    result = await self.download_video(message, channel_name)
+                except Exception as e:
+                    logger.error(f"Ошибка при загрузке сообщения {message.id}: {e}")
+                    result = None
+                finally:
+                    pbar.update(1)
+                if result is None:
+                    continue
+                status, file_size = result
+                if status == 'downloaded':
+                    self.downloaded_count += 1
+                    self.total_size += file_size
+                elif status == 'skipped':
+                    self.skipped_count += 1
+                elif status == 'failed':
+                    self.failed_count += 1
+
+        # Параллелизм ограничен количеством воркеров
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.max_concurrent)]
+
+        try:
+            async for message in messages:
+                # Уже скачанные файлы отсеиваем до постановки в очередь:
+                # один поиск по индексу метаданных вместо прохода
+                # через очередь и воркер
+                if self.file_handler.is_file_downloaded(message.id, channel_name):
+                    logger.debug(f"Файл {message.id} уже скачан, пропускаем")
+                    self.skipped_count += 1
+                    pbar.update(1)
+                    continue
+                await queue.put(message)
+        finally:
+            # Останавливаем воркеров и дожидаемся активных загрузок
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            pbar.close()
+
+        # Досбрасываем накопленные метаданные после завершения пакета
+        self.file_handler.flush()
+
+        return {
+            'downloaded': self.downloaded_count,
+            'skipped': self.skipped_count,
+            'failed': self.failed_count,
+            'total_size': self.total_size
+        }
+
     async def download_batch(
         self,
         messages: List[Message],
         channel_name: str
     ) -> Dict:
         """
-        Загрузка пакета видео с параллелизмом.
+        Загрузка заранее собранного списка видео с параллелизмом.
+
+        Тонкая обертка над download_stream для кода, у которого уже
+        есть готовый список сообщений.
 
         Args:
             messages: Список сообщений для загрузки
@@ -644,38 +782,11 @@ class DownloadManager:
                 'total_size': 0
             }
 
-        # Создаем семафор для ограничения параллелизма
-        semaphore = asyncio.Semaphore(self.max_concurrent)
-        
-        # Создаем прогресс-бар
-        pbar = tqdm(total=len(messages), desc=f"Загрузка из {channel_name}", unit="файл")
-
-        async def download_with_semaphore(message: Message):
-            """Загрузка с ограничением параллелизма."""
-            async with semaphore:
-                result = await self.download_video(message, channel_name)
-                pbar.update(1)
-                return result
-
-        # Запускаем все загрузки
-        tasks = [download_with_semaphore(msg) for msg in messages]
-        # Используем return_exceptions=True, чтобы все задачи завершились,
-        # даже если некоторые упали с ошибкой
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Логируем исключения, если они были
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                logger.error(f"Ошибка при загрузке сообщения {messages[i].id}: {result}")
-        
-        pbar.close()
+        async def as_stream():
+            for message in messages:
+                yield message
 
-        return {
-            'downloaded': self.downloaded_count,
-            'skipped': self.skipped_count,
-            'failed': self.failed_count,
-            'total_size': self.total_size
-        }
+        return await self.download_stream(as_stream(), channel_name, total=len(messages))
 
     def get_statistics(self) -> Dict:
         """
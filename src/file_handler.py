@@ -4,12 +4,37 @@
 import os
 import json
 import logging
+import time
 from pathlib import Path
 from typing import Dict, Set, Optional
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Таблица замены символов, недопустимых в именах файлов: один проход
+# str.translate на C-уровне вместо цепочки replace по каждому символу
+_INVALID_FS_CHARS_TABLE = str.maketrans({char: '_' for char in '<>:"/\\|?*'})
+
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
+# orjson парсит и сериализует JSON в разы быстрее stdlib на машинных данных
+# и отдает сразу bytes - журнал пишется без промежуточного str.
+# Если библиотека не установлена, прозрачно используем стандартный json.
+try:
+    import orjson
+
+    def _loads(data):
+        return orjson.loads(data)
+
+    def _dumps_line(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def _loads(data):
+        return json.loads(data)
+
+    def _dumps_line(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
 
 class FileHandler:
     """Обработчик файлов и метаданных."""
@@ -24,33 +49,291 @@ class FileHandler:
         """
         self.download_path = Path(download_path)
         self.data_path = Path(data_path)
-        self.metadata_file = self.data_path / "downloaded_files.json"
-        
-        # Создаем необходимые папки
-        self.download_path.mkdir(parents=True, exist_ok=True)
-        self.data_path.mkdir(parents=True, exist_ok=True)
-        
-        # Загружаем метаданные
-        self.metadata = self._load_metadata()
+        # Журнал метаданных в формате NDJSON: одна запись - одна строка.
+        # Каждая отметка о загрузке дописывается в конец файла вместо
+        # полной перезаписи всего JSON-документа.
+        self.metadata_file = self.data_path / "downloaded_files.ndjson"
+        # Старый формат (единый JSON-документ) - для миграции
+        self.legacy_metadata_file = self.data_path / "downloaded_files.json"
+        # Кэш имен каналов между запусками: имя канала почти не меняется,
+        # а его запрос - это сетевой round-trip к Telegram на каждый запуск
+        self.channel_names_file = self.data_path / "channel_names.json"
+
+        # Буфер отложенной записи журнала: строки копятся в памяти и
+        # сбрасываются на диск одной записью (по таймеру, по размеру буфера
+        # или явным вызовом flush()), вместо открытия файла на каждую отметку
+        self._pending_lines = []
+        # Индекс буфера по (канал, message_id): повторная отметка того же
+        # файла (downloading -> completed) заменяет строку в буфере,
+        # а не добавляет вторую
+        self._pending_keys = {}
+        self._flush_interval = 2.0
+        self._max_pending = 32
+        self._last_flush = time.monotonic()
+
+        # Кэш текущего времени для отметок: datetime.now().isoformat()
+        # вызывался дважды на каждую отметку, хотя секундной точности
+        # достаточно - обновляем строку не чаще раза в секунду
+        self._ts_cache: Optional[str] = None
+        self._ts_cache_at = 0.0
+
+        # Метаданные и индекс загружаются лениво при первом обращении
+        # (см. свойство metadata): создание папок и чтение журнала не
+        # тормозят запуск, если обработчик фактически не используется
+        self._metadata: Optional[Dict] = None
+        self._message_index_cache: Optional[Dict] = None
+
+        # Сохраненные между запусками имена каналов
+        self._channel_names = self._load_channel_names()
+
+        # Кэш уже созданных папок: повторные вызовы get_*_folder
+        # не делают лишних mkdir-сисколлов
+        self._channel_folder_cache: Dict[str, Path] = {}
+        self._series_folder_cache: Dict[tuple, Path] = {}
+
+        # Карта файлов на диске по каналам (имя файла -> размер):
+        # один рекурсивный обход папки канала вместо отдельных
+        # сисколлов exists() + stat() на каждую проверку
+        self._channel_scan_cache: Dict[str, Dict[str, int]] = {}
+
+        # Кэш уже проверенных файлов: (channel_name, message_id).
+        # Повторные вызовы is_file_downloaded в рамках одного запуска
+        # не перечитывают метаданные и не обращаются к диску.
+        self._verified = set()
+
+    @property
+    def metadata(self) -> Dict:
+        """
+        Метаданные скачанных файлов.
+
+        Папки и журнал создаются/читаются при первом обращении,
+        а не в конструкторе.
+        """
+        if self._metadata is None:
+            self.download_path.mkdir(parents=True, exist_ok=True)
+            self.data_path.mkdir(parents=True, exist_ok=True)
+            self._metadata = self._load_metadata()
+            self._message_index_cache = self._build_message_index()
+        return self._metadata
+
+    @property
+    def _message_index(self) -> Dict:
+        """Плоский индекс записей по (канал, message_id)."""
+        if self._message_index_cache is None:
+            self.metadata  # триггерит ленивую загрузку
+        return self._message_index_cache
 
     def _load_metadata(self) -> Dict:
-        """Загрузка метаданных из файла."""
+        """
+        Загрузка метаданных.
+
+        Сначала пробуем воспроизвести NDJSON-журнал. Если его еще нет,
+        но есть файл старого формата - загружаем его и переносим записи
+        в журнал (сам старый файл не трогаем).
+        """
         if self.metadata_file.exists():
-            try:
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.warning(f"Ошибка при загрузке метаданных: {e}, создаем новый файл")
-                return {}
+            return self._replay_log()
+        if self.legacy_metadata_file.exists():
+            metadata = self._load_legacy_metadata()
+            if metadata:
+                self._migrate_legacy(metadata)
+            return metadata
         return {}
 
-    def _save_metadata(self):
-        """Сохранение метаданных в файл."""
+    def _build_message_index(self) -> Dict:
+        """Построение плоского индекса записей по ключу (канал, message_id)."""
+        index: Dict = {}
+        for channel_key, channel_data in self.metadata.items():
+            for message_key, record in channel_data.get('messages', {}).items():
+                index[(channel_key, message_key)] = record
+        return index
+
+    def _load_legacy_metadata(self) -> Dict:
+        """Загрузка метаданных из файла старого формата (единый JSON)."""
+        try:
+            with open(self.legacy_metadata_file, 'rb') as f:
+                return _loads(f.read())
+        except Exception as e:
+            logger.warning(f"Ошибка при загрузке метаданных: {e}, создаем новый файл")
+            return {}
+
+    def _migrate_legacy(self, metadata: Dict):
+        """Перенос записей из старого JSON-файла в NDJSON-журнал."""
+        logger.info(f"Миграция метаданных в {self.metadata_file.name}")
+        for channel_name, channel_data in metadata.items():
+            for message_key, record in channel_data.get('messages', {}).items():
+                self._append_event(channel_name, message_key, record)
+        self.flush()
+
+    def _replay_log(self) -> Dict:
+        """Восстановление метаданных воспроизведением NDJSON-журнала."""
+        metadata: Dict = {}
+        line_count = 0
+        try:
+            with open(self.metadata_file, 'rb') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    line_count += 1
+                    try:
+                        event = _loads(line)
+                    except Exception:
+                        logger.warning(f"Поврежденная строка в журнале метаданных, пропускаем: {line[:100]}")
+                        continue
+                    self._apply_event(metadata, event)
+        except Exception as e:
+            logger.warning(f"Ошибка при загрузке метаданных: {e}, создаем новый файл")
+            return {}
+
+        # Если история сильно длиннее актуального состояния - сжимаем журнал,
+        # чтобы следующие загрузки не воспроизводили устаревшие строки
+        live_records = sum(len(channel_data['messages']) for channel_data in metadata.values())
+        if line_count > 1000 and line_count > 2 * live_records:
+            self._compact(metadata)
+
+        return metadata
+
+    @staticmethod
+    def _apply_event(metadata: Dict, event: Dict):
+        """Применение одной записи журнала к метаданным в памяти."""
+        channel_key = event.get('channel')
+        message_id = event.get('message_id')
+        if channel_key is None or message_id is None:
+            return
+
+        if channel_key not in metadata:
+            metadata[channel_key] = {
+                'channel_name': channel_key,
+                'messages': {},
+                'last_updated': None
+            }
+
+        record = {
+            'file_path': event.get('file_path'),
+            'file_size': event.get('file_size', 0),
+            'quality': event.get('quality'),
+            'status': event.get('status')
+        }
+        ts = event.get('ts')
+        if record['status'] == 'completed':
+            record['downloaded_at'] = ts
+        else:
+            record['started_at'] = ts
+
+        metadata[channel_key]['messages'][str(message_id)] = record
+        metadata[channel_key]['last_updated'] = ts
+
+    @staticmethod
+    def _make_event(channel_name: str, message_id, record: Dict) -> Dict:
+        """Формирование записи журнала из записи метаданных."""
+        return {
+            'channel': channel_name,
+            'message_id': message_id,
+            'file_path': record.get('file_path'),
+            'file_size': record.get('file_size', 0),
+            'quality': record.get('quality'),
+            'status': record.get('status'),
+            'ts': record.get('downloaded_at') or record.get('started_at')
+        }
+
+    def _compact(self, metadata: Dict):
+        """
+        Сжатие журнала: одна строка на актуальную запись вместо всей истории.
+
+        Новый журнал пишется во временный файл и атомарно заменяет старый.
+        """
+        logger.info("Сжатие журнала метаданных")
+        tmp_file = self.metadata_file.with_suffix('.tmp')
         try:
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, ensure_ascii=False, indent=2)
+            with open(tmp_file, 'wb') as f:
+                for channel_name, channel_data in metadata.items():
+                    for message_key, record in channel_data.get('messages', {}).items():
+                        f.write(_dumps_line(self._make_event(channel_name, message_key, record)) + b'\n')
+            os.replace(tmp_file, self.metadata_file)
+        except Exception as e:
+            logger.warning(f"Не удалось сжать журнал метаданных: {e}")
+
+    def _append_event(self, channel_name: str, message_id, record: Dict):
+        """Постановка одной записи журнала в буфер отложенной записи."""
+        line = _dumps_line(self._make_event(channel_name, message_id, record)) + b'\n'
+        pending_key = (channel_name, str(message_id))
+        pending_index = self._pending_keys.get(pending_key)
+        if pending_index is not None:
+            # Файл уже отмечен в этом окне - обновляем строку на месте
+            self._pending_lines[pending_index] = line
+        else:
+            self._pending_keys[pending_key] = len(self._pending_lines)
+            self._pending_lines.append(line)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        """Сброс буфера, если он заполнился или прошел интервал ожидания."""
+        if (len(self._pending_lines) >= self._max_pending
+                or time.monotonic() - self._last_flush >= self._flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Запись всех накопленных записей журнала на диск одной операцией."""
+        self._last_flush = time.monotonic()
+        if not self._pending_lines:
+            return
+        try:
+            with open(self.metadata_file, 'ab') as f:
+                f.writelines(self._pending_lines)
         except Exception as e:
             logger.error(f"Ошибка при сохранении метаданных: {e}")
+            return
+        self._pending_lines.clear()
+        self._pending_keys.clear()
+
+    def _now_iso(self) -> str:
+        """Текущее время в ISO-формате с точностью до секунды (кэш ~1с)."""
+        now = time.monotonic()
+        if self._ts_cache is None or now - self._ts_cache_at >= 1.0:
+            self._ts_cache = datetime.now().isoformat(timespec='seconds')
+            self._ts_cache_at = now
+        return self._ts_cache
+
+    def _load_channel_names(self) -> Dict:
+        """Загрузка кэша имен каналов (пустой словарь, если файла еще нет)."""
+        try:
+            if self.channel_names_file.exists():
+                with open(self.channel_names_file, 'rb') as f:
+                    return _loads(f.read())
+        except Exception as e:
+            logger.warning(f"Ошибка при загрузке кэша имен каналов: {e}")
+        return {}
+
+    def get_cached_channel_name(self, channel_identifier: str) -> Optional[str]:
+        """
+        Получение сохраненного имени канала.
+
+        Args:
+            channel_identifier: Идентификатор канала из конфига
+
+        Returns:
+            Имя канала или None, если оно еще не запрашивалось
+        """
+        return self._channel_names.get(channel_identifier)
+
+    def set_cached_channel_name(self, channel_identifier: str, channel_name: str):
+        """
+        Сохранение имени канала в кэш между запусками.
+
+        Args:
+            channel_identifier: Идентификатор канала из конфига
+            channel_name: Разрешенное имя канала
+        """
+        if self._channel_names.get(channel_identifier) == channel_name:
+            return
+        self._channel_names[channel_identifier] = channel_name
+        try:
+            self.data_path.mkdir(parents=True, exist_ok=True)
+            with open(self.channel_names_file, 'w', encoding='utf-8') as f:
+                json.dump(self._channel_names, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.warning(f"Ошибка при сохранении кэша имен каналов: {e}")
 
     def get_channel_folder(self, channel_name: str) -> Path:
         """
@@ -62,8 +345,11 @@ class FileHandler:
         Returns:
             Path к папке канала
         """
-        channel_folder = self.download_path / channel_name
-        channel_folder.mkdir(parents=True, exist_ok=True)
+        channel_folder = self._channel_folder_cache.get(channel_name)
+        if channel_folder is None:
+            channel_folder = self.download_path / channel_name
+            channel_folder.mkdir(parents=True, exist_ok=True)
+            self._channel_folder_cache[channel_name] = channel_folder
         return channel_folder
 
     def get_series_folder(self, channel_name: str, series_name: str) -> Path:
@@ -77,19 +363,71 @@ class FileHandler:
         Returns:
             Path к папке серии
         """
-        channel_folder = self.get_channel_folder(channel_name)
-        # Очищаем имя серии от недопустимых символов
-        invalid_chars = '<>:"/\\|?*'
-        safe_series_name = series_name
-        for char in invalid_chars:
-            safe_series_name = safe_series_name.replace(char, '_')
-        # Ограничиваем длину
-        safe_series_name = safe_series_name[:200].strip('. ')
-        
-        series_folder = channel_folder / safe_series_name
-        series_folder.mkdir(parents=True, exist_ok=True)
+        cache_key = (channel_name, series_name)
+        series_folder = self._series_folder_cache.get(cache_key)
+        if series_folder is None:
+            channel_folder = self.get_channel_folder(channel_name)
+            # Очищаем имя серии от недопустимых символов и ограничиваем длину
+            safe_series_name = series_name.translate(_INVALID_FS_CHARS_TABLE)[:200].strip('. ')
+
+            series_folder = channel_folder / safe_series_name
+            series_folder.mkdir(parents=True, exist_ok=True)
+            self._series_folder_cache[cache_key] = series_folder
         return series_folder
 
+    def _get_channel_file_sizes(self, channel_name: str) -> Dict[str, int]:
+        """
+        Карта имя_файла -> размер для всех файлов папки канала.
+
+        Папка канала обходится scandir-ом один раз за запуск; дальше
+        проверки файлов - это поиск в словаре без обращений к диску.
+
+        Args:
+            channel_name: Имя канала
+
+        Returns:
+            Словарь имя_файла -> размер в байтах
+        """
+        sizes = self._channel_scan_cache.get(channel_name)
+        if sizes is None:
+            sizes = {}
+            stack = [self.download_path / channel_name]
+            while stack:
+                folder = stack.pop()
+                try:
+                    with os.scandir(folder) as entries:
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            else:
+                                try:
+                                    sizes[entry.name] = entry.stat().st_size
+                                except OSError:
+                                    continue
+                except OSError:
+                    continue
+            self._channel_scan_cache[channel_name] = sizes
+        return sizes
+
+    def prefilter_batch(self, channel_name: str, message_ids) -> Set[int]:
+        """
+        Отбор уже скачанных сообщений пакета.
+
+        После первого обращения к каналу проверки идут по карте
+        файлов в памяти, без stat() на каждый файл.
+
+        Args:
+            channel_name: Имя канала
+            message_ids: ID сообщений для проверки
+
+        Returns:
+            Множество ID уже скачанных сообщений
+        """
+        return {
+            message_id for message_id in message_ids
+            if self.is_file_downloaded(message_id, channel_name)
+        }
+
     def is_file_downloaded(self, message_id: int, channel_name: str) -> bool:
         """
         Проверка, скачан ли уже файл.
@@ -101,26 +439,26 @@ class FileHandler:
         Returns:
             True если файл уже скачан и существует на диске
         """
-        channel_key = channel_name
-        if channel_key not in self.metadata:
-            return False
+        # Быстрый путь: файл уже проверен в этом запуске
+        if (channel_name, message_id) in self._verified:
+            return True
 
-        message_key = str(message_id)
-        message_data = self.metadata[channel_key].get('messages', {}).get(message_key)
+        message_data = self._message_index.get((channel_name, str(message_id)))
         if not message_data:
             return False
 
         # Проверяем, существует ли файл на диске и его размер совпадает
+        # (по карте файлов канала, без сисколлов на каждый файл)
         file_path = message_data.get('file_path')
         expected_size = message_data.get('file_size', 0)
-        
+
         if file_path:
-            file = Path(file_path)
-            if file.exists():
-                actual_size = file.stat().st_size
+            actual_size = self._get_channel_file_sizes(channel_name).get(os.path.basename(file_path))
+            if actual_size is not None:
                 # Если размер совпадает (или файл больше ожидаемого - возможно обновлен),
                 # считаем что файл скачан
                 if actual_size >= expected_size and expected_size > 0:
+                    self._verified.add((channel_name, message_id))
                     return True
                 # Если файл существует, но размер меньше ожидаемого - файл неполный,
                 # нужно перезагрузить
@@ -156,29 +494,29 @@ class FileHandler:
             self.metadata[channel_key] = {
                 'channel_name': channel_name,
                 'messages': {},
-                'total_files': 0,
-                'total_size': 0,
                 'last_updated': None
             }
 
         message_key = str(message_id)
-        is_new = message_key not in self.metadata[channel_key]['messages']
-        
+        now = self._now_iso()
+
         # Сохраняем метаданные с пометкой "в процессе"
         self.metadata[channel_key]['messages'][message_key] = {
             'file_path': file_path,
             'file_size': expected_size,  # Ожидаемый размер
             'quality': quality,
             'status': 'downloading',  # Статус: в процессе загрузки
-            'started_at': datetime.now().isoformat()
+            'started_at': now
         }
-        
-        # Обновляем статистику только для новых файлов
-        if is_new:
-            self.metadata[channel_key]['total_files'] += 1
-        
-        self.metadata[channel_key]['last_updated'] = datetime.now().isoformat()
-        self._save_metadata()
+        self._message_index[(channel_key, message_key)] = self.metadata[channel_key]['messages'][message_key]
+        self.metadata[channel_key]['last_updated'] = now
+        self._append_event(channel_name, message_id, self.metadata[channel_key]['messages'][message_key])
+        # Файл сейчас будет перезаписан - сбрасываем кэши проверок,
+        # чтобы не счесть старую (возможно неполную) версию скачанной
+        self._verified.discard((channel_name, message_id))
+        sizes = self._channel_scan_cache.get(channel_name)
+        if sizes is not None:
+            sizes.pop(os.path.basename(file_path), None)
 
     def mark_file_as_downloaded(
         self,
@@ -203,44 +541,39 @@ class FileHandler:
             self.metadata[channel_key] = {
                 'channel_name': channel_name,
                 'messages': {},
-                'total_files': 0,
-                'total_size': 0,
                 'last_updated': None
             }
 
         message_key = str(message_id)
-        is_new = message_key not in self.metadata[channel_key]['messages']
-        
-        # Обновляем метаданные - файл полностью скачан
-        old_data = self.metadata[channel_key]['messages'].get(message_key, {})
-        old_size = old_data.get('file_size', 0)
-        
+        now = self._now_iso()
+
+        # Обновляем метаданные - файл полностью скачан. Агрегаты
+        # (количество и суммарный размер) не ведем инкрементально:
+        # get_download_statistics считает их по записям по требованию
         self.metadata[channel_key]['messages'][message_key] = {
             'file_path': file_path,
             'file_size': file_size,  # Реальный размер
             'quality': quality,
             'status': 'completed',  # Статус: завершено
-            'downloaded_at': datetime.now().isoformat()
+            'downloaded_at': now
         }
-        
-        # Обновляем статистику
-        if is_new:
-            self.metadata[channel_key]['total_files'] += 1
-            self.metadata[channel_key]['total_size'] += file_size
-        else:
-            # Если файл был в процессе загрузки, обновляем размер
-            if old_size != file_size:
-                self.metadata[channel_key]['total_size'] = (
-                    self.metadata[channel_key]['total_size'] - old_size + file_size
-                )
-        
-        self.metadata[channel_key]['last_updated'] = datetime.now().isoformat()
-        self._save_metadata()
+        self._message_index[(channel_key, message_key)] = self.metadata[channel_key]['messages'][message_key]
+        self.metadata[channel_key]['last_updated'] = now
+        self._append_event(channel_name, message_id, self.metadata[channel_key]['messages'][message_key])
+        # Файл только что записан - считаем его проверенным в рамках запуска
+        self._verified.add((channel_name, message_id))
+        # Обновляем карту файлов канала, если она уже построена
+        sizes = self._channel_scan_cache.get(channel_name)
+        if sizes is not None:
+            sizes[os.path.basename(file_path)] = file_size
 
     def get_download_statistics(self) -> Dict:
         """
         Получение статистики скачанных файлов.
 
+        Агрегаты считаются по записям на месте: это избавляет
+        mark_file_as_* от инкрементальной бухгалтерии на каждую отметку.
+
         Returns:
             Словарь со статистикой
         """
@@ -252,9 +585,14 @@ class FileHandler:
         }
 
         for channel_key, channel_data in self.metadata.items():
+            messages = channel_data.get('messages', {})
             channel_stats = {
-                'files': channel_data.get('total_files', 0),
-                'size': channel_data.get('total_size', 0),
+                'files': len(messages),
+                'size': sum(
+                    record.get('file_size', 0)
+                    for record in messages.values()
+                    if record.get('status') == 'completed'
+                ),
                 'last_updated': channel_data.get('last_updated')
             }
             stats['channels'][channel_key] = channel_stats
@@ -265,7 +603,7 @@ class FileHandler:
 
     def format_file_size(self, size_bytes: int) -> str:
         """
-        Форматирование размера файла в читаемый вид.
+        Форматирование размера файла в читаемый вид (O(1), без цикла делений).
 
         Args:
             size_bytes: Размер в байтах
@@ -273,9 +611,9 @@ class FileHandler:
         Returns:
             Отформатированная строка
         """
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if size_bytes < 1024.0:
-                return f"{size_bytes:.2f} {unit}"
-            size_bytes /= 1024.0
-        return f"{size_bytes:.2f} PB"
+        if size_bytes <= 0:
+            return "0.00 B"
+        # Порядок величины по битовой длине: 10 бит на каждую ступень в 1024 раза
+        index = min((int(size_bytes).bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+        return f"{size_bytes / (1 << (index * 10)):.2f} {_SIZE_UNITS[index]}"
 
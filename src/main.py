@@ -2,7 +2,9 @@
 Главный скрипт для запуска загрузчика видео из Telegram каналов.
 """
 import asyncio
+import atexit
 import logging
+import logging.handlers
 import sys
 from pathlib import Path
 import yaml
@@ -80,7 +82,25 @@ def setup_logging(config: dict):
         else:
             log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
-        handlers.append(logging.FileHandler(str(log_path), encoding='utf-8'))
+        # Пишем в файл пачками через MemoryHandler: до 1024 записей
+        # копятся в памяти и сбрасываются одной записью (или сразу при
+        # ERROR), вместо отдельной мелкой записи на каждую строку лога.
+        # delay=True откладывает открытие файла до первого сброса.
+        # Форматтер ставим на целевой FileHandler явно: basicConfig
+        # настраивает только сам MemoryHandler, а при сбросе буфера
+        # записи форматирует целевой обработчик
+        target = logging.FileHandler(str(log_path), encoding='utf-8', delay=True)
+        target.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        ))
+        file_handler = logging.handlers.MemoryHandler(
+            capacity=1024,
+            flushLevel=logging.ERROR,
+            target=target
+        )
+        # Гарантируем, что хвост буфера попадет в файл при завершении
+        atexit.register(file_handler.flush)
+        handlers.append(file_handler)
 
     logging.basicConfig(
         level=log_level,
@@ -90,6 +110,90 @@ def setup_logging(config: dict):
     )
 
 
+async def _process_channel(
+    channel_identifier,
+    sem: asyncio.Semaphore,
+    client: TelegramClientWrapper,
+    file_handler: FileHandler,
+    quality_handler: VideoQualityHandler,
+    download_config: dict,
+    notifier,
+    notifications_config: dict,
+    refresh_names: bool
+):
+    """
+    Обработка одного канала под семафором.
+
+    Каналы - независимые задачи, поэтому обрабатываются параллельно;
+    семафор ограничивает, сколько каналов перечисляется одновременно.
+
+    Args:
+        channel_identifier: Идентификатор канала из конфига
+        sem: Семафор, ограничивающий число одновременных каналов
+        client: Telegram клиент
+        file_handler: Обработчик файлов
+        quality_handler: Обработчик качества видео
+        download_config: Секция download конфигурации
+        notifier: Уведомления (или None)
+        notifications_config: Секция notifications конфигурации
+        refresh_names: Принудительно обновить кэш имен каналов
+
+    Returns:
+        Словарь со статистикой канала или None при ошибке
+    """
+    async with sem:
+        logger.info(f"Обработка канала: {channel_identifier}")
+
+        try:
+            # Получаем имя канала (из кэша между запусками, если есть -
+            # имя почти не меняется, а его запрос стоит round-trip к API)
+            channel_name = None if refresh_names else file_handler.get_cached_channel_name(channel_identifier)
+            if channel_name is None:
+                channel_name = await client.get_channel_name(channel_identifier)
+                file_handler.set_cached_channel_name(channel_identifier, channel_name)
+            logger.info(f"Имя канала: {channel_name}")
+
+            # Свой менеджер на канал: статистика каналов не смешивается
+            # при параллельной обработке
+            download_manager = DownloadManager(
+                client=client.client,
+                file_handler=file_handler,
+                quality_handler=quality_handler,
+                max_concurrent=download_config.get('max_concurrent', 5),
+                retry_attempts=download_config.get('retry_attempts', 3),
+                retry_delay=download_config.get('retry_delay', 5)
+            )
+
+            # Загружаем видео по мере перечисления канала: первые файлы
+            # качаются, пока остальные сообщения еще перечисляются
+            stats = await download_manager.download_stream(
+                client.iter_video_messages(channel_identifier),
+                channel_name
+            )
+
+            if not (stats['downloaded'] or stats['skipped'] or stats['failed']):
+                logger.info(f"Видео не найдены в канале {channel_name}")
+                return stats
+
+            logger.info(
+                f"Канал {channel_name} обработан: "
+                f"скачано {stats['downloaded']}, "
+                f"пропущено {stats['skipped']}, "
+                f"ошибок {stats['failed']}"
+            )
+            return stats
+
+        except Exception as e:
+            logger.error(f"Ошибка при обработке канала {channel_identifier}: {e}", exc_info=True)
+            # Продолжаем обработку других каналов даже при ошибке
+            if notifier and notifications_config.get('notify_on_errors', False):
+                try:
+                    await notifier.notify_error(f"Ошибка в канале {channel_identifier}: {str(e)}")
+                except Exception as notify_error:
+                    logger.warning(f"Не удалось отправить уведомление об ошибке: {notify_error}")
+            return None
+
+
 async def main():
     """Главная функция."""
     # Загружаем конфигурацию
@@ -121,16 +225,6 @@ async def main():
         download_nearest=download_config.get('download_nearest_quality', True)
     )
 
-    # Менеджер загрузок
-    download_manager = DownloadManager(
-        client=client.client,
-        file_handler=file_handler,
-        quality_handler=quality_handler,
-        max_concurrent=download_config.get('max_concurrent', 5),
-        retry_attempts=download_config.get('retry_attempts', 3),
-        retry_delay=download_config.get('retry_delay', 5)
-    )
-
     # Уведомления (если включены)
     notifier = None
     if notifications_config.get('enabled', False):
@@ -156,59 +250,42 @@ async def main():
             except Exception as e:
                 logger.warning(f"Не удалось отправить уведомление о начале: {e}")
 
-        # Обрабатываем каждый канал
+        # Флаг --refresh сбрасывает кэш имен и заново запрашивает их у API
+        refresh_names = '--refresh' in sys.argv
+
+        # Обрабатываем каналы параллельно: суммарное время стремится
+        # к максимуму по каналам, а не к сумме. Семафор ограничивает
+        # число одновременно обрабатываемых каналов
+        sem = asyncio.Semaphore(download_config.get('channel_concurrency', 2))
+        results = await asyncio.gather(*[
+            _process_channel(
+                channel_identifier,
+                sem,
+                client,
+                file_handler,
+                quality_handler,
+                download_config,
+                notifier,
+                notifications_config,
+                refresh_names
+            )
+            for channel_identifier in channels
+        ])
+
+        # Сводим статистику каналов воедино
         total_stats = {
             'downloaded': 0,
             'skipped': 0,
             'failed': 0,
             'total_size': 0
         }
-
-        for channel_identifier in channels:
-            logger.info(f"Обработка канала: {channel_identifier}")
-            
-            try:
-                # Получаем имя канала
-                channel_name = await client.get_channel_name(channel_identifier)
-                logger.info(f"Имя канала: {channel_name}")
-
-                # Получаем все видео из канала
-                video_messages = await client.get_video_messages(channel_identifier)
-                
-                if not video_messages:
-                    logger.info(f"Видео не найдены в канале {channel_name}")
-                    continue
-
-                logger.info(f"Найдено {len(video_messages)} видео в канале {channel_name}")
-
-                # Сбрасываем статистику для нового канала
-                download_manager.reset_statistics()
-
-                # Загружаем видео
-                stats = await download_manager.download_batch(video_messages, channel_name)
-                
-                # Обновляем общую статистику
-                total_stats['downloaded'] += stats['downloaded']
-                total_stats['skipped'] += stats['skipped']
-                total_stats['failed'] += stats['failed']
-                total_stats['total_size'] += stats['total_size']
-
-                logger.info(
-                    f"Канал {channel_name} обработан: "
-                    f"скачано {stats['downloaded']}, "
-                    f"пропущено {stats['skipped']}, "
-                    f"ошибок {stats['failed']}"
-                )
-
-            except Exception as e:
-                logger.error(f"Ошибка при обработке канала {channel_identifier}: {e}", exc_info=True)
-                # Продолжаем обработку других каналов даже при ошибке
-                if notifier and notifications_config.get('notify_on_errors', False):
-                    try:
-                        await notifier.notify_error(f"Ошибка в канале {channel_identifier}: {str(e)}")
-                    except Exception as notify_error:
-                        logger.warning(f"Не удалось отправить уведомление об ошибке: {notify_error}")
+        for stats in results:
+            if not stats:
                 continue
+            total_stats['downloaded'] += stats['downloaded']
+            total_stats['skipped'] += stats['skipped']
+            total_stats['failed'] += stats['failed']
+            total_stats['total_size'] += stats['total_size']
 
         # Форматируем общую статистику
         total_stats['total_size_formatted'] = file_handler.format_file_size(total_stats['total_size'])
@@ -239,6 +316,14 @@ async def main():
             except Exception as notify_error:
                 logger.warning(f"Не удалось отправить уведомление об ошибке: {notify_error}")
     finally:
+        # Сбрасываем несохраненные метаданные на диск
+        file_handler.flush()
+        # Закрываем HTTP-сессию уведомлений
+        if notifier:
+            try:
+                await notifier.close()
+            except Exception as e:
+                logger.warning(f"Не удалось закрыть сессию уведомлений: {e}")
         # Отключаемся от Telegram
         await client.disconnect()
 
@@ -1,6 +1,7 @@
 """
 Модуль для отправки уведомлений через Telegram бота.
 """
+import json
 import logging
 import aiohttp
 from typing import Dict, Optional
@@ -23,6 +24,38 @@ class TelegramNotifier:
         # Chat ID может быть как числом, так и строкой
         self.chat_id = str(chat_id) if isinstance(chat_id, int) else chat_id
         self.api_url = f"https://api.telegram.org/bot{bot_token}"
+        # Одна сессия на все уведомления: TCP+TLS соединение с api.telegram.org
+        # устанавливается один раз и переиспользуется (создается лениво)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # После первой неудачной отправки уведомления отключаются до конца
+        # запуска: при неверном chat_id нет смысла ходить в API на каждое
+        # сообщение и ждать тот же отказ
+        self._disabled = False
+        self._disable_reason: Optional[str] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Получение общей HTTP-сессии (создается при первом обращении)."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=4, keepalive_timeout=60)
+            )
+        return self._session
+
+    async def close(self):
+        """Закрытие HTTP-сессии. Вызывается при завершении работы."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def _disable(self, reason: str):
+        """Отключение уведомлений после первой ошибки отправки."""
+        self._disabled = True
+        self._disable_reason = reason
+        logger.warning(f"⚠️ Уведомления отключены до конца запуска: {reason}")
+
+    def re_enable(self):
+        """Явное повторное включение уведомлений после ошибки."""
+        self._disabled = False
+        self._disable_reason = None
 
     async def send_message(self, text: str, parse_mode: str = "HTML") -> bool:
         """
@@ -35,6 +68,12 @@ class TelegramNotifier:
         Returns:
             True если отправлено успешно
         """
+        # Быстрый выход: предыдущая отправка уже показала, что конфигурация
+        # нерабочая - не строим запрос и не открываем соединение
+        if self._disabled:
+            logger.debug(f"Уведомление пропущено (уведомления отключены: {self._disable_reason})")
+            return False
+
         url = f"{self.api_url}/sendMessage"
         data = {
             "chat_id": self.chat_id,
@@ -43,32 +82,33 @@ class TelegramNotifier:
         }
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=data) as response:
-                    if response.status == 200:
-                        logger.debug("Уведомление отправлено успешно")
-                        return True
-                    else:
-                        error_text = await response.text()
-                        # Парсим JSON ошибки для более понятного сообщения
-                        try:
-                            import json
-                            error_json = json.loads(error_text)
-                            error_desc = error_json.get('description', error_text)
-                            if 'chat not found' in error_desc.lower():
-                                logger.warning(
-                                    f"⚠️ Не удалось отправить уведомление: чат не найден. "
-                                    f"Убедитесь, что вы начали диалог с ботом (напишите ему /start) "
-                                    f"или проверьте правильность Chat ID в конфиге. "
-                                    f"Работа продолжается без уведомлений."
-                                )
-                            else:
-                                logger.warning(f"⚠️ Ошибка при отправке уведомления: {error_desc}. Работа продолжается.")
-                        except:
-                            logger.warning(f"⚠️ Ошибка при отправке уведомления: {error_text}. Работа продолжается.")
-                        return False
+            session = self._get_session()
+            async with session.post(url, json=data) as response:
+                if response.status == 200:
+                    logger.debug("Уведомление отправлено успешно")
+                    return True
+                else:
+                    error_text = await response.text()
+                    # Парсим JSON ошибки для более понятного сообщения
+                    try:
+                        error_json = json.loads(error_text)
+                        error_desc = error_json.get('description', error_text)
+                        if 'chat not found' in error_desc.lower():
+                            logger.warning(
+                                f"⚠️ Не удалось отправить уведомление: чат не найден. "
+                                f"Убедитесь, что вы начали диалог с ботом (напишите ему /start) "
+                                f"или проверьте правильность Chat ID в конфиге. "
+                                f"Работа продолжается без уведомлений."
+                            )
+                        else:
+                            logger.warning(f"⚠️ Ошибка при отправке уведомления: {error_desc}. Работа продолжается.")
+                    except:
+                        logger.warning(f"⚠️ Ошибка при отправке уведомления: {error_text}. Работа продолжается.")
+                    self._disable(error_text[:200])
+                    return False
         except Exception as e:
             logger.warning(f"⚠️ Исключение при отправке уведомления: {e}. Работа продолжается.")
+            self._disable(str(e))
             return False
 
     async def notify_start(self, channels: list) -> bool:
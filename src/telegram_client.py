@@ -6,11 +6,16 @@ import logging
 from pathlib import Path
 from typing import List, Optional, Dict
 from telethon import TelegramClient
+from telethon.sessions import StringSession
 from telethon.tl.types import Message, MessageMediaDocument, DocumentAttributeVideo, MessageMediaPhoto
 from telethon.errors import ChannelPrivateError, UsernameNotOccupiedError
 
 logger = logging.getLogger(__name__)
 
+# Таблица замены символов, недопустимых в именах файлов: один проход
+# str.translate на C-уровне вместо цепочки replace по каждому символу
+_INVALID_FS_CHARS_TABLE = str.maketrans({char: '_' for char in '<>:"/\\|?*'})
+
 
 class TelegramClientWrapper:
     """Обертка над Telethon клиентом для удобной работы с каналами."""
@@ -32,15 +37,53 @@ class TelegramClientWrapper:
         project_root = current_file.parent.parent
         session_path = project_root / "sessions" / session_name
         session_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        self.client = TelegramClient(str(session_path), api_id, api_hash)
+
+        # Быстрый путь: сохраненная строковая сессия вместо SQLite-файла.
+        # SQLite-сессия Telethon делает много мелких fsync-записей при
+        # каждом подключении; строковая сессия - это один файл, который
+        # читается целиком при старте
+        self._session_string_file = session_path.parent / f"{session_name}.session_str"
+        self._session_string = self._read_session_string()
+        if self._session_string:
+            session = StringSession(self._session_string)
+        else:
+            # Первый запуск: обычная SQLite-сессия для интерактивного логина
+            session = str(session_path)
+
+        self.client = TelegramClient(session, api_id, api_hash)
         self._connected = False
+        # Кэш сущностей каналов: get_channel_name и get_video_messages
+        # для одного канала делают один запрос к API вместо двух
+        self._entity_cache: Dict[str, object] = {}
+
+    def _read_session_string(self) -> Optional[str]:
+        """Чтение сохраненной строковой сессии (None если ее еще нет)."""
+        try:
+            if self._session_string_file.exists():
+                return self._session_string_file.read_text(encoding='utf-8').strip() or None
+        except OSError as e:
+            logger.debug(f"Не удалось прочитать строковую сессию: {e}")
+        return None
+
+    def _save_session_string(self):
+        """Экспорт сессии в строковый файл (только если она изменилась)."""
+        try:
+            session_string = StringSession.save(self.client.session)
+            if session_string and session_string != self._session_string:
+                self._session_string_file.write_text(session_string, encoding='utf-8')
+                self._session_string = session_string
+                logger.debug(f"Строковая сессия сохранена в {self._session_string_file.name}")
+        except Exception as e:
+            logger.debug(f"Не удалось сохранить строковую сессию: {e}")
 
     async def connect(self):
         """Подключение к Telegram."""
         if not self._connected:
             await self.client.start()
             self._connected = True
+            # После успешного логина сохраняем строковую сессию,
+            # чтобы следующие запуски стартовали без SQLite
+            self._save_session_string()
             logger.info("Успешно подключено к Telegram")
 
     async def disconnect(self):
@@ -69,6 +112,11 @@ class TelegramClientWrapper:
         Returns:
             Entity канала или None если не найдено
         """
+        # Быстрый путь: канал уже разрешался в этом запуске
+        cached = self._entity_cache.get(channel_identifier)
+        if cached is not None:
+            return cached
+
         try:
             # Пробуем разные способы получения канала
             if channel_identifier.startswith("https://t.me/joinchat/"):
@@ -86,6 +134,7 @@ class TelegramClientWrapper:
                     entity = await self.client.get_entity(channel_identifier)
 
             logger.info(f"Канал найден: {entity.title if hasattr(entity, 'title') else channel_identifier}")
+            self._entity_cache[channel_identifier] = entity
             return entity
         except ChannelPrivateError:
             logger.error(f"Канал {channel_identifier} приватный или недоступен")
@@ -97,83 +146,134 @@ class TelegramClientWrapper:
             logger.error(f"Ошибка при получении канала {channel_identifier}: {e}")
             return None
 
-    async def get_video_messages(self, channel_identifier: str, limit: Optional[int] = None) -> List[Message]:
+    async def iter_video_messages(self, channel_identifier: str, limit: Optional[int] = None):
         """
-        Получение всех сообщений с видео из канала.
+        Потоковое получение сообщений с видео из канала.
+
+        Сообщения отдаются по мере получения от Telegram, не дожидаясь
+        полного перечисления канала: загрузка первых видео начинается,
+        пока остальные еще перечисляются. Сообщения одного альбома идут
+        в ленте подряд, поэтому альбом буферизуется целиком и отдается,
+        когда начинается следующий пост.
 
         Args:
             channel_identifier: Username, invite link или ID канала
             limit: Максимальное количество сообщений (None = все)
 
-        Returns:
-            Список сообщений с видео
+        Yields:
+            Сообщения с видео
         """
         entity = await self.get_channel_entity(channel_identifier)
         if not entity:
-            return []
+            return
 
-        video_messages: List[Message] = []
-        media_groups: Dict[int, List[Message]] = {}
+        found = 0
+        # Буфер текущей медиагруппы (альбома): фото и текст поста
+        # часто лежат в соседних сообщениях той же группы
+        group_id = None
+        group_messages: List[Message] = []
 
         try:
             async for message in self.client.iter_messages(entity, limit=limit):
-                # Собираем сообщения по медиагруппам (альбомам)
                 grouped_id = getattr(message, "grouped_id", None)
+
+                # Началась другая группа или одиночный пост - текущий
+                # альбом собран полностью, отдаем его видео
+                if group_messages and grouped_id != group_id:
+                    for video_msg in self._finalize_album(group_messages):
+                        found += 1
+                        yield video_msg
+                    group_messages = []
+                group_id = grouped_id
+
                 if grouped_id is not None:
-                    media_groups.setdefault(grouped_id, []).append(message)
+                    group_messages.append(message)
+                    continue
 
-                # Отбираем только сообщения с видео
+                # Одиночное сообщение - отбираем только видео
                 if self._is_video_message(message):
-                    video_messages.append(message)
+                    found += 1
                     logger.debug(f"Найдено видео: {message.id} из канала {channel_identifier}")
+                    yield message
         except Exception as e:
             logger.error(f"Ошибка при получении сообщений из {channel_identifier}: {e}")
 
-        # Для каждого видео, которое входит в альбом, прикрепляем связанные фото и все сообщения альбома
+        # Хвост ленты мог закончиться альбомом
+        for video_msg in self._finalize_album(group_messages):
+            found += 1
+            yield video_msg
+
+        logger.info(f"Найдено {found} видео в канале {channel_identifier}")
+
+    def _finalize_album(self, group_messages: List[Message]) -> List[Message]:
+        """
+        Подготовка видео из полностью собранного альбома.
+
+        Args:
+            group_messages: Все сообщения одной медиагруппы
+
+        Returns:
+            Список сообщений с видео из альбома
+        """
+        video_messages = [msg for msg in group_messages if self._is_video_message(msg)]
+        if not video_messages:
+            return []
+
+        album_photos = [
+            msg for msg in group_messages
+            if isinstance(msg.media, MessageMediaPhoto)
+        ]
         for video_msg in video_messages:
-            grouped_id = getattr(video_msg, "grouped_id", None)
-            if grouped_id is None:
-                continue
-
-            group_messages = media_groups.get(grouped_id, [])
-            album_photos = [
-                msg for msg in group_messages
-                if isinstance(msg.media, MessageMediaPhoto)
-            ]
             if album_photos:
                 # Сохраняем связанные фото прямо в объекте сообщения,
                 # чтобы использовать их позже в DownloadManager
                 setattr(video_msg, "_album_photos", album_photos)
-            
+
             # Сохраняем все сообщения альбома, чтобы можно было найти текст поста
             # (текст часто находится в первом сообщении альбома, а не в сообщении с видео)
             setattr(video_msg, "_album_messages", group_messages)
 
-        logger.info(f"Найдено {len(video_messages)} видео в канале {channel_identifier}")
         return video_messages
 
-    def _is_video_message(self, message: Message) -> bool:
+    async def get_video_messages(self, channel_identifier: str, limit: Optional[int] = None) -> List[Message]:
+        """
+        Получение всех сообщений с видео из канала единым списком.
+
+        Тонкая обертка над iter_video_messages для кода, которому нужен
+        готовый список; потоковым потребителям лучше итерировать напрямую.
+
+        Args:
+            channel_identifier: Username, invite link или ID канала
+            limit: Максимальное количество сообщений (None = все)
+
+        Returns:
+            Список сообщений с видео
+        """
+        return [
+            message
+            async for message in self.iter_video_messages(channel_identifier, limit=limit)
+        ]
+
+    def _is_video_message(self, message: Message, _video_attr=DocumentAttributeVideo) -> bool:
         """
         Проверка, является ли сообщение видео.
 
+        Вызывается на каждое сообщение канала, поэтому проверка
+        атрибутов свернута в one any() без Python-цикла, а тип
+        атрибута закэширован в аргументе по умолчанию.
+
         Args:
             message: Сообщение для проверки
 
         Returns:
             True если это видео
         """
-        if not message.media:
-            return False
-
-        if isinstance(message.media, MessageMediaDocument):
-            doc = message.media.document
-            if doc:
-                # Проверяем атрибуты документа
-                for attr in doc.attributes:
-                    if isinstance(attr, DocumentAttributeVideo):
-                        return True
-
-        return False
+        media = message.media
+        return (
+            isinstance(media, MessageMediaDocument)
+            and media.document is not None
+            and any(isinstance(attr, _video_attr) for attr in media.document.attributes)
+        )
 
     async def get_channel_name(self, channel_identifier: str) -> str:
         """
@@ -187,13 +287,8 @@ class TelegramClientWrapper:
         """
         entity = await self.get_channel_entity(channel_identifier)
         if entity and hasattr(entity, 'title'):
-            # Очищаем имя от недопустимых символов
-            name = entity.title
-            # Заменяем недопустимые символы на подчеркивания
-            invalid_chars = '<>:"/\\|?*'
-            for char in invalid_chars:
-                name = name.replace(char, '_')
-            return name
+            # Заменяем недопустимые символы на подчеркивания одним проходом
+            return entity.title.translate(_INVALID_FS_CHARS_TABLE)
         # Если не удалось получить имя, используем идентификатор
         safe_name = channel_identifier.replace('@', '').replace('https://t.me/joinchat/', 'invite_')
         return safe_name[:50]  # Ограничиваем длину
@@ -1,12 +1,20 @@
 """
 Модуль для определения и выбора качества видео из Telegram.
 """
+import bisect
 import logging
 from typing import List, Optional, Tuple
 from telethon.tl.types import Document, DocumentAttributeVideo
 
 logger = logging.getLogger(__name__)
 
+# Сентинел для кэша качеств: отличает "не вычислялось" от честного None
+# (документ без видео-атрибута)
+_MISSING = object()
+
+# Типовые высоты видео в Telegram - для предрасчета таблицы решений
+_COMMON_HEIGHTS = (144, 240, 360, 480, 540, 576, 720, 1080, 1440, 2160)
+
 
 class VideoQualityHandler:
     """Обработчик качества видео."""
@@ -14,6 +22,14 @@ class VideoQualityHandler:
     # Целевые качества в пикселях (высота)
     TARGET_QUALITIES = [360, 480, 720]
 
+    # Фиксированный набор полей: экземпляр без __dict__ компактнее,
+    # а доступ к атрибутам на горячем пути идет через слот-дескриптор
+    __slots__ = (
+        'target_qualities', 'download_nearest',
+        '_target_set', '_max_target', '_min_target', '_targets_repr',
+        '_quality_cache', '_avail_cache', '_decision'
+    )
+
     def __init__(self, target_qualities: List[int] = None, download_nearest: bool = True):
         """
         Инициализация обработчика качества.
@@ -22,29 +38,88 @@ class VideoQualityHandler:
             target_qualities: Список целевых качеств (по умолчанию [360, 480, 720])
             download_nearest: Скачивать ближайшее меньшее качество, если точного нет
         """
-        self.target_qualities = target_qualities or self.TARGET_QUALITIES
+        # Качества по возрастанию; кортеж фиксирует их после инициализации
+        # и чуть быстрее списка при индексировании. Сортируем только если
+        # порядок действительно нарушен - дефолт и списки из конфига
+        # почти всегда уже отсортированы
+        qualities = list(target_qualities or self.TARGET_QUALITIES)
+        for i in range(1, len(qualities)):
+            if qualities[i] < qualities[i - 1]:
+                qualities.sort()
+                break
+        self.target_qualities = tuple(qualities)
         self.download_nearest = download_nearest
-        # Сортируем качества по возрастанию
-        self.target_qualities = sorted(self.target_qualities)
+        # Быстрые структуры для выбора качества: проверка точного
+        # совпадения за O(1) и границы целевых качеств
+        self._target_set = frozenset(self.target_qualities)
+        self._max_target = self.target_qualities[-1]
+        self._min_target = self.target_qualities[0]
+        # Готовый repr целевых качеств для сообщений лога
+        self._targets_repr = repr(self.target_qualities)
+        # Кэш качеств по id документа: обход атрибутов выполняется
+        # один раз на документ, повторные проверки - поиск в словаре
+        self._quality_cache = {}
+        # Кэш результатов get_available_qualities_from_messages:
+        # ключ - дешевый отпечаток списка (длина + id крайних элементов)
+        self._avail_cache = {}
+        # Таблица решений по высоте: конфигурация фиксирована на весь
+        # запуск, поэтому ветвление выполняется один раз на высоту,
+        # а горячий путь - один поиск в словаре
+        self._decision = {
+            height: self._decide(height)
+            for height in set(_COMMON_HEIGHTS) | self._target_set
+        }
 
-    def get_video_quality(self, document: Document) -> Optional[int]:
+    def get_video_quality(
+        self,
+        document: Document,
+        _video_attr=DocumentAttributeVideo,
+        _type=type
+    ) -> Optional[int]:
         """
         Получение качества видео из документа.
 
+        Тип атрибута и type() привязаны аргументами по умолчанию:
+        LOAD_FAST вместо глобального поиска на каждый вызов.
+
         Args:
             document: Документ Telegram
 
         Returns:
             Высота видео в пикселях или None
         """
-        for attr in document.attributes:
-            if isinstance(attr, DocumentAttributeVideo):
-                return attr.h  # Высота видео
-        return None
+        key = getattr(document, 'id', None)
+        if key is not None:
+            cached = self._quality_cache.get(key, _MISSING)
+            if cached is not _MISSING:
+                return cached
 
-    def should_download_video(self, document: Document) -> Tuple[bool, Optional[int]]:
+        # Telethon создает точные экземпляры атрибутов, поэтому вместо
+        # isinstance достаточно сравнения типов - без обхода MRO.
+        # Идем с конца: видео-атрибут обычно последний (после
+        # Filename/Audio), так что чаще всего хватает одного шага.
+        # TL-объекты хранят поля в обычном __dict__ экземпляра - читаем
+        # высоту из него напрямую, минуя полный протокол атрибутов
+        attributes = document.attributes
+        try:
+            quality = next(
+                (attr.__dict__['h'] for attr in reversed(attributes) if _type(attr) is _video_attr),
+                None
+            )
+        except (AttributeError, KeyError):
+            # На случай, если Telethon переведет атрибуты на __slots__
+            quality = next(
+                (attr.h for attr in reversed(attributes) if _type(attr) is _video_attr),
+                None
+            )
+
+        if key is not None:
+            self._quality_cache[key] = quality
+        return quality
+
+    def _decide(self, video_quality: int) -> Tuple[bool, Optional[int]]:
         """
-        Определение, нужно ли скачивать видео и какое качество выбрать.
+        Решение для одной высоты видео (вычисляется один раз на высоту).
 
         Логика выбора:
         1. Если доступное качество точно совпадает с целевым - скачиваем его
@@ -52,70 +127,155 @@ class VideoQualityHandler:
         3. Если доступное качество ниже целевых - выбираем ближайшее меньшее (если включено)
 
         Args:
-            document: Документ Telegram
+            video_quality: Высота видео в пикселях
 
         Returns:
             Кортеж (нужно_ли_скачивать, выбранное_качество)
         """
-        video_quality = self.get_video_quality(document)
-        if video_quality is None:
-            # Если не удалось определить качество, скачиваем
-            logger.debug("Не удалось определить качество видео, скачиваем")
-            return True, None
+        # Быстрый выход: качество выше всех целевых - берем максимальное
+        # целевое, без проверки множества и бинарного поиска
+        if self.download_nearest and video_quality > self._max_target:
+            logger.debug(
+                "Выбрано лучшее доступное качество: %sp (доступно %sp, целевые: %s)",
+                self._max_target, video_quality, self._targets_repr
+            )
+            return True, self._max_target
 
-        # Проверяем, совпадает ли качество с целевыми
-        if video_quality in self.target_qualities:
-            logger.debug(f"Найдено целевое качество: {video_quality}p")
+        # Проверяем, совпадает ли качество с целевыми (O(1) по множеству)
+        if video_quality in self._target_set:
+            logger.debug("Найдено целевое качество: %sp", video_quality)
             return True, video_quality
 
+        # Качество ниже всех целевых - пропускаем без поиска
+        if video_quality < self._min_target:
+            logger.debug(
+                "Доступное качество %sp меньше всех целевых (%s), пропускаем",
+                video_quality, self._targets_repr
+            )
+            return False, None
+
         # Если точного совпадения нет
         if self.download_nearest:
-            # Ищем максимальное целевое качество, которое не превышает доступное
-            # (т.е. выбираем лучшее качество из доступных целевых)
-            best_quality = None
-            for target_q in reversed(self.target_qualities):  # Идем от большего к меньшему
-                if video_quality >= target_q:
-                    best_quality = target_q
-                    break
-
-            if best_quality:
-                logger.debug(
-                    f"Выбрано лучшее доступное качество: {best_quality}p "
-                    f"(доступно {video_quality}p, целевые: {self.target_qualities})"
-                )
-                return True, best_quality
-            else:
-                # Если доступное качество меньше всех целевых
-                logger.debug(
-                    f"Доступное качество {video_quality}p меньше всех целевых "
-                    f"({self.target_qualities}), пропускаем"
-                )
-                return False, None
+            # Осталась только промежуточная высота между целевыми:
+            # бинарный поиск ближайшего меньшего целевого качества
+            index = bisect.bisect_right(self.target_qualities, video_quality) - 1
+            best_quality = self.target_qualities[index]
+            logger.debug(
+                "Выбрано лучшее доступное качество: %sp (доступно %sp, целевые: %s)",
+                best_quality, video_quality, self._targets_repr
+            )
+            return True, best_quality
         else:
             # Если не скачивать ближайшее, пропускаем
             logger.debug(
-                f"Качество {video_quality}p не совпадает с целевыми "
-                f"({self.target_qualities}), пропускаем"
+                "Качество %sp не совпадает с целевыми (%s), пропускаем",
+                video_quality, self._targets_repr
             )
             return False, None
 
+    def should_download_video(self, document: Document) -> Tuple[bool, Optional[int]]:
+        """
+        Определение, нужно ли скачивать видео и какое качество выбрать.
+
+        Конфигурация фиксирована, поэтому решение по высоте берется из
+        предрассчитанной таблицы; ветвление из _decide выполняется
+        только для редких нестандартных высот (и кэшируется).
+
+        Args:
+            document: Документ Telegram
+
+        Returns:
+            Кортеж (нужно_ли_скачивать, выбранное_качество)
+        """
+        video_quality = self.get_video_quality(document)
+        if video_quality is None:
+            # Если не удалось определить качество, скачиваем
+            logger.debug("Не удалось определить качество видео, скачиваем")
+            return True, None
+
+        decision = self._decision.get(video_quality)
+        if decision is None:
+            decision = self._decide(video_quality)
+            self._decision[video_quality] = decision
+        return decision
+
+    def bulk_should_download(self, heights: List[int]) -> List[Tuple[bool, Optional[int]]]:
+        """
+        Пакетное решение для списка высот видео.
+
+        Одна list-comprehension поверх таблицы решений вместо вызова
+        should_download_video на каждый элемент: без повторного поиска
+        качества по документу и кадра вызова на высоту.
+
+        Args:
+            heights: Список высот видео в пикселях
+
+        Returns:
+            Список кортежей (нужно_ли_скачивать, выбранное_качество)
+            в порядке исходных высот
+        """
+        decision = self._decision
+        # Досчитываем редкие нестандартные высоты до прохода, чтобы сам
+        # проход остался без ветвлений - map по __getitem__ целиком на C
+        for height in set(heights) - decision.keys():
+            decision[height] = self._decide(height)
+        return list(map(decision.__getitem__, heights))
+
+    def _extract_quality(self, message) -> Optional[int]:
+        """
+        Качество видео из сообщения или None.
+
+        EAFP вместо каскада hasattr: каждый hasattr - это тот же getattr
+        с перехватом исключения, только по три раза на сообщение.
+
+        Args:
+            message: Сообщение с возможным видео
+
+        Returns:
+            Высота видео в пикселях или None
+        """
+        try:
+            document = message.media.document
+        except AttributeError:
+            return None
+        if document is None:
+            return None
+        return self.get_video_quality(document)
+
+    def invalidate_cache(self):
+        """Сброс кэша доступных качеств (вызывать при изменении списка сообщений)."""
+        self._avail_cache.clear()
+
     def get_available_qualities_from_messages(self, messages: List) -> List[int]:
         """
         Получение списка всех доступных качеств из списка сообщений.
 
+        Повторный вызов для того же списка (статистика, затем фильтрация)
+        не обходит сообщения заново: результат запоминается по дешевому
+        отпечатку списка.
+
         Args:
             messages: Список сообщений с видео
 
         Returns:
             Список уникальных качеств
         """
-        qualities = set()
-        for message in messages:
-            if hasattr(message, 'media') and message.media:
-                if hasattr(message.media, 'document') and message.media.document:
-                    quality = self.get_video_quality(message.media.document)
-                    if quality:
-                        qualities.add(quality)
-
-        return sorted(list(qualities))
+        key = (len(messages), id(messages[0]), id(messages[-1])) if messages else None
+        if key is not None:
+            cached = self._avail_cache.get(key)
+            if cached is not None:
+                return cached
+
+        qualities = sorted({
+            quality
+            for quality in map(self._extract_quality, messages)
+            if quality
+        })
+
+        if key is not None:
+            # Ограничиваем кэш, вытесняя самые старые записи
+            if len(self._avail_cache) >= 16:
+                self._avail_cache.pop(next(iter(self._avail_cache)))
+            self._avail_cache[key] = qualities
+        return qualities
 